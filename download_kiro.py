@@ -4,20 +4,58 @@ Kiro Downloader - Downloads the latest stable version of Kiro for Linux x64
 """
 
 import argparse
+import base64
+import collections
+import functools
+import hashlib
+import http.client
+import io
 import json
+import mmap
 import os
+import shutil
+import stat
 import subprocess
 import sys
 import tarfile
+import threading
+import time
+import urllib.error
+import urllib.parse
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    from isal import igzip_threaded
+except ImportError:
+    igzip_threaded = None
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
 
 # Configuration
 METADATA_URL = "https://prod.download.desktop.kiro.dev/stable/metadata-linux-x64-stable.json"
 SCRIPT_DIR = Path(__file__).parent.resolve()
-VERSION_FILE = SCRIPT_DIR / ".kiro_version"
+STATE_FILE = SCRIPT_DIR / ".kiro_state.json"
+LEGACY_VERSION_FILE = SCRIPT_DIR / ".kiro_version"
+METADATA_CACHE_FILE = SCRIPT_DIR / ".kiro_metadata.json"
+METADATA_ETAG_FILE = SCRIPT_DIR / ".kiro_metadata.etag"
+MANIFEST_FILE = SCRIPT_DIR / ".kiro_tar_manifest.json"
+EXTRACT_PENDING_FILE = SCRIPT_DIR / ".kiro_extract_pending"
 SYMLINK_PATH = Path("/usr/local/bin/kiro")
+DOWNLOAD_BUFFER_SIZE = 256 * 1024
+RANGE_SIZE = 8 * 1024 * 1024
+RANGE_WORKERS = 8
+HTTP_TIMEOUT = 60
+USER_AGENT = "kiro-downloader"
+PROGRESS_INTERVAL = 0.1  # Redraw the progress bar at most 10 times per second
+# Members are checked by is_safe_member(), so skip tarfile's own per-member
+# filter (the default from Python 3.14, and a warning on 3.12-3.13)
+EXTRACT_OPTIONS = {"filter": "fully_trusted"} if hasattr(tarfile, "fully_trusted_filter") else {}
 
 # ANSI Color codes
 class Colors:
@@ -32,26 +70,181 @@ class Colors:
     WHITE = "\033[97m"
 
 
+# (color, bold) -> ANSI prefix, built once so cprint does no string formatting
+COLOR_PREFIXES = {
+    (color, bold): (Colors.BOLD if bold else "") + color
+    for color in ["", *(value for name, value in vars(Colors).items() if not name.startswith("_"))]
+    for bold in (False, True)
+}
+
+
 def cprint(text, color="", bold=False, end="\n"):
     """Print colored text to terminal."""
-    style = Colors.BOLD if bold else ""
-    print(f"{style}{color}{text}{Colors.RESET}", end=end)
+    sys.stdout.write(COLOR_PREFIXES[(color, bold)] + text + Colors.RESET + end)
+
+
+def atomic_write(path, data, sync=False):
+    """Write bytes to path via a temp file and os.replace, so readers never see a partial file."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Keep-alive connections for the download, one per (scheme, host) and thread.
+# The HEAD probe and a single-stream GET share one TLS session, and every
+# range worker reuses its own across all of its ranges instead of paying a
+# fresh handshake per range. The small metadata request stays on urllib.
+_connections = threading.local()
+
+
+def open_connection(scheme, host):
+    """Open a connection to host, through the *_proxy environment proxy if one applies."""
+    # Returns (connection, forward_headers). forward_headers is None for direct
+    # and tunnelled connections; for a plain HTTP proxy it holds the headers to
+    # send with every request, whose target must then be the absolute URL.
+    conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return conn_class(host, timeout=HTTP_TIMEOUT), None
+    
+    proxy_parts = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    # Default the port from the proxy URL, not the target (HTTPSConnection would pick 443)
+    proxy_host = proxy_parts.hostname
+    proxy_port = proxy_parts.port or (443 if proxy_parts.scheme == "https" else 80)
+    proxy_headers = {}
+    if proxy_parts.username:
+        credentials = f"{urllib.parse.unquote(proxy_parts.username)}:{urllib.parse.unquote(proxy_parts.password or '')}"
+        proxy_headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode()).decode()
+    if scheme == "https":
+        # CONNECT through the proxy, TLS then runs end to end with the server
+        conn = conn_class(proxy_host, proxy_port, timeout=HTTP_TIMEOUT)
+        conn.set_tunnel(host, headers=proxy_headers)
+        return conn, None
+    return http.client.HTTPConnection(proxy_host, proxy_port, timeout=HTTP_TIMEOUT), proxy_headers
+
+
+def get_connection(scheme, host, fresh=False):
+    """Return this thread's persistent (connection, forward_headers) for host, opening it if needed."""
+    if not hasattr(_connections, "pool"):
+        _connections.pool = {}
+    entry = _connections.pool.get((scheme, host))
+    if entry is None or fresh:
+        if entry is not None:
+            entry[0].close()
+        entry = _connections.pool[(scheme, host)] = open_connection(scheme, host)
+    return entry
+
+
+def drop_connection(scheme, host):
+    """Close and forget this thread's connection to host."""
+    entry = getattr(_connections, "pool", {}).pop((scheme, host), None)
+    if entry is not None:
+        entry[0].close()
+
+
+def http_request(url, method="GET", headers=None, max_redirects=5):
+    """Send a request over this thread's persistent connection, returning (response, final URL)."""
+    # Callers must read each response to the end before the next request
+    # goes out on the same thread
+    headers = {"User-Agent": USER_AGENT, **(headers or {})}
+    for _ in range(max_redirects + 1):
+        parts = urllib.parse.urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        for attempt in range(2):
+            conn, forward_headers = get_connection(parts.scheme, parts.netloc, fresh=attempt > 0)
+            try:
+                if forward_headers is None:
+                    conn.request(method, path, headers=headers)
+                else:
+                    # Plain HTTP proxies take the absolute URL as request target
+                    absolute_url = urllib.parse.urlunsplit(parts._replace(fragment=""))
+                    conn.request(method, absolute_url, headers={**headers, **forward_headers})
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if attempt:
+                    drop_connection(parts.scheme, parts.netloc)
+                    raise
+                # The server closed the idle keep-alive connection, reconnect once
+            except Exception:
+                # A half-sent request leaves the connection unusable, the next
+                # request on it would fail with CannotSendRequest
+                drop_connection(parts.scheme, parts.netloc)
+                raise
+        location = response.getheader("Location")
+        if response.status in (301, 302, 303, 307, 308) and location:
+            response.read()
+            url = urllib.parse.urljoin(url, location)
+            continue
+        return response, url
+    raise IOError(f"too many redirects for {url}")
+
+
+def request_metadata(headers):
+    """GET the metadata with urllib, returning (status, body, ETag, Last-Modified)."""
+    request = urllib.request.Request(METADATA_URL, headers={"User-Agent": USER_AGENT, **headers})
+    try:
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            return (response.status, response.read(),
+                    response.headers.get("ETag", ""), response.headers.get("Last-Modified", ""))
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+        return 304, b"", "", ""
 
 
 def fetch_metadata():
-    """Fetch the metadata JSON from the Kiro server."""
+    """Fetch the metadata JSON from the Kiro server, reusing the cached copy if unchanged."""
     cprint("🌐 Fetching metadata...", Colors.CYAN)
+    headers = {}
+    if METADATA_CACHE_FILE.exists() and METADATA_ETAG_FILE.exists():
+        # The validator file holds the ETag on the first line and Last-Modified on the second
+        etag, _, last_modified = METADATA_ETAG_FILE.read_text().partition("\n")
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    
     try:
-        with urllib.request.urlopen(METADATA_URL) as response:
-            data = response.read()
-            return json.loads(data)
+        status, data, etag, last_modified = request_metadata(headers)
+        if status == 304:
+            try:
+                cached = json_loads(METADATA_CACHE_FILE.read_bytes())
+                cprint("  Metadata unchanged, using cached copy", Colors.CYAN)
+                return cached
+            except (OSError, ValueError):
+                # The cache is corrupt, drop it and fetch unconditionally once
+                cprint("  Cached metadata is unreadable, downloading it again", Colors.YELLOW)
+                for cache_file in (METADATA_CACHE_FILE, METADATA_ETAG_FILE):
+                    if cache_file.exists():
+                        cache_file.unlink()
+                status, data, etag, last_modified = request_metadata({})
+        if status != 200:
+            raise IOError(f"HTTP {status}")
+        metadata = json_loads(data)
     except Exception as e:
         cprint(f"✗ Error fetching metadata: {e}", Colors.RED, bold=True)
         sys.exit(1)
-
-
-def find_tarball_url(metadata):
-    """Extract the tar.gz download URL from metadata."""
+    
+    try:
+        atomic_write(METADATA_CACHE_FILE, data)
+        if etag or last_modified:
+            atomic_write(METADATA_ETAG_FILE, f"{etag}\n{last_modified}".encode())
+        elif METADATA_ETAG_FILE.exists():
+            METADATA_ETAG_FILE.unlink()
+    except OSError:
+        pass  # Not critical, the next run just downloads the full metadata again
+    return metadata
+
+
+@functools.lru_cache(maxsize=1)
+def get_release_info():
+    """Return the latest (version, tar.gz URL, tarball SHA-256, binary SHA-256), fetching metadata once per run."""
+    metadata = fetch_metadata()
     current_version = metadata.get("currentRelease")
     if not current_version:
         cprint("✗ Error: No current release found in metadata", Colors.RED, bold=True)
@@ -62,65 +255,396 @@ def find_tarball_url(metadata):
         update_to = release.get("updateTo", {})
         url = update_to.get("url", "")
         if url.endswith(".tar.gz"):
-            return current_version, url
+            # The hashes are optional, None when the metadata doesn't publish them.
+            # binarySha256 isn't part of the current metadata format, it is only
+            # a guess at the key and the recovery path stays off unless it appears.
+            return current_version, url, update_to.get("sha256"), update_to.get("binarySha256")
     
     cprint("✗ Error: No tar.gz file found in releases", Colors.RED, bold=True)
     sys.exit(1)
 
 
-def get_installed_version():
-    """Get the currently installed version from version file."""
-    if VERSION_FILE.exists():
-        return VERSION_FILE.read_text().strip()
+def url_digest(url):
+    """Return the SHA-256 hex digest of a download URL."""
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def load_install_state():
+    """Load the install state file, or an empty dict if it is missing or unreadable."""
+    try:
+        return json.loads(STATE_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_install_state(version, url, binary_path):
+    """Record the installed version, its download URL and the binary it produced."""
+    state = {
+        "version": version,
+        "url_sha256": url_digest(url) if url else None,
+        "binary_path": str(binary_path) if binary_path else None,
+        "binary_size": binary_path.stat().st_size if binary_path else None,
+    }
+    # Synced, an interrupted install never leaves an empty or partial state
+    # file behind
+    atomic_write(STATE_FILE, json.dumps(state, indent=2).encode(), sync=True)
+
+
+def binary_is_current(path, expected_sha256=None, expected_size=None):
+    """Check a binary against its published SHA-256, or its recorded size when no hash is published."""
+    try:
+        if expected_sha256:
+            # Hash the mapped pages directly, without copying the file through userspace buffers
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.sha256(mm).hexdigest() == expected_sha256.lower()
+        return os.stat(path).st_size == expected_size
+    except (OSError, ValueError):
+        return False  # Missing, unreadable or empty (mmap rejects empty files)
+
+
+def migrate_legacy_version(latest_version, latest_url):
+    """Convert the .kiro_version file written by older versions of this script into the state file."""
+    if STATE_FILE.exists() or not LEGACY_VERSION_FILE.exists():
+        return
+    try:
+        version = LEGACY_VERSION_FILE.read_text().strip()
+        if version:
+            # The old file didn't record the URL, it can only be the latest
+            # one if the installed version is the latest
+            url = latest_url if version == latest_version else None
+            save_install_state(version, url, find_kiro_binary(SCRIPT_DIR))
+        LEGACY_VERSION_FILE.unlink()
+    except OSError:
+        pass  # Not critical, the install is simply treated as unknown
+
+
+def is_install_current(state, version, url):
+    """Check that the recorded install matches this release and its binary still has the recorded size."""
+    if state.get("version") != version or state.get("url_sha256") != url_digest(url):
+        return False
+    if EXTRACT_PENDING_FILE.exists():
+        return False  # An extract over this install never finished
+    binary_path = state.get("binary_path")
+    if not binary_path:
+        return False
+    # A stat() only, the binary is hashed just on the recovery path in find_current_binary()
+    return binary_is_current(binary_path, expected_size=state.get("binary_size"))
+
+
+def find_current_binary(binary_sha256):
+    """Return the on-disk Kiro binary if it matches the published hash of the latest release."""
+    if not binary_sha256:
+        return None
+    # A matching binary says nothing about the rest of the tree, which may
+    # still be a mix of two releases if the last extract was interrupted
+    if EXTRACT_PENDING_FILE.exists():
+        return None
+    binary_path = find_kiro_binary(SCRIPT_DIR)
+    if binary_path and binary_is_current(binary_path, binary_sha256):
+        return binary_path
     return None
 
 
-def save_installed_version(version):
-    """Save the installed version to version file."""
-    VERSION_FILE.write_text(version)
+class ProgressReader(io.RawIOBase):
+    """Raw stream wrapper that hashes and draws a progress bar as bytes are read."""
 
+    def __init__(self, raw, total_size):
+        self.raw = raw
+        self.total_size = total_size
+        self.downloaded = 0
+        self.sha256 = hashlib.sha256()
+        self.last_report = 0.0
 
-def download_file(url, destination):
-    """Download a file with progress indication."""
-    cprint(f"📥 Downloading from: {url}", Colors.BLUE)
-    cprint(f"💾 Saving to: {destination}", Colors.BLUE)
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        if n:
+            self.sha256.update(memoryview(buffer)[:n])
+            self.downloaded += n
+            self.report_progress()
+        return n
+
+    def report_progress(self):
+        now = time.monotonic()
+        finished = self.downloaded >= self.total_size
+        if now - self.last_report < PROGRESS_INTERVAL and not finished:
+            return
+        self.last_report = now
+        if self.total_size > 0:
+            percent = min(100, (self.downloaded * 100) // self.total_size)
+            downloaded_mb = self.downloaded / (1024 * 1024)
+            total_mb = self.total_size / (1024 * 1024)
+            bar_length = 40
+            filled = int(bar_length * percent / 100)
+            bar = "█" * filled + "░" * (bar_length - filled)
+            cprint(f"\rProgress: [{bar}] {percent}% ({downloaded_mb:.2f} MB / {total_mb:.2f} MB)", Colors.CYAN, end="")
+            sys.stdout.flush()
+
+
+def fetch_range(url, start, end):
+    """Fetch bytes start..end (inclusive) of url with an HTTP Range request."""
+    response, _ = http_request(url, headers={"Range": f"bytes={start}-{end}"})
+    data = response.read()
+    if response.status != 206:
+        raise IOError(f"server ignored Range request (HTTP {response.status})")
+    if len(data) != end - start + 1:
+        raise IOError(f"short read for bytes {start}-{end}")
+    return data
+
+
+class RangeReader(io.RawIOBase):
+    """Raw stream that fetches a file as parallel Range requests, read back in order."""
+
+    def __init__(self, url, total_size, workers=RANGE_WORKERS, range_size=RANGE_SIZE):
+        self.url = url
+        self.total_size = total_size
+        self.range_size = range_size
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = collections.deque()
+        self.next_offset = 0
+        self.block = memoryview(b"")
+        # Keep one range in flight per worker; memory use is bounded by
+        # workers * range_size
+        for _ in range(workers):
+            self.schedule_next()
+
+    def schedule_next(self):
+        if self.next_offset >= self.total_size:
+            return
+        end = min(self.next_offset + self.range_size, self.total_size) - 1
+        self.pending.append(self.executor.submit(fetch_range, self.url, self.next_offset, end))
+        self.next_offset = end + 1
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.block:
+            if not self.pending:
+                return 0
+            self.block = memoryview(self.pending.popleft().result())
+            self.schedule_next()
+        n = min(len(buffer), len(self.block))
+        buffer[:n] = self.block[:n]
+        self.block = self.block[n:]
+        return n
+
+    def close(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
+        super().close()
+
+
+def open_download(url):
+    """Open url as a raw stream, split into parallel ranges when the server allows it."""
+    try:
+        response, final_url = http_request(url, method="HEAD")
+        response.read()
+        total_size = int(response.getheader("Content-Length") or 0)
+        accepts_ranges = response.getheader("Accept-Ranges", "").lower() == "bytes"
+        if response.status == 200 and accepts_ranges and total_size > RANGE_SIZE:
+            return RangeReader(final_url, total_size), total_size
+    except Exception:
+        pass  # Servers that reject HEAD (e.g. signed GET URLs) get a single stream
     
+    response, _ = http_request(url)
+    if response.status != 200:
+        response.read()
+        raise IOError(f"HTTP {response.status} {response.reason}")
+    return response, int(response.getheader("Content-Length") or 0)
+
+
+def load_manifest():
+    """Load the {member name: [size, mtime]} manifest of the previous extract."""
     try:
-        def report_progress(block_num, block_size, total_size):
-            downloaded = block_num * block_size
-            if total_size > 0:
-                percent = min(100, (downloaded * 100) // total_size)
-                downloaded_mb = downloaded / (1024 * 1024)
-                total_mb = total_size / (1024 * 1024)
-                bar_length = 40
-                filled = int(bar_length * percent / 100)
-                bar = "█" * filled + "░" * (bar_length - filled)
-                print(f"\r{Colors.CYAN}Progress: [{bar}] {percent}% ({downloaded_mb:.2f} MB / {total_mb:.2f} MB){Colors.RESET}", end="")
-        
-        urllib.request.urlretrieve(url, destination, reporthook=report_progress)
-        print()  # New line after progress
-        cprint("✓ Download complete!", Colors.GREEN, bold=True)
-        return True
-    except Exception as e:
-        cprint(f"\n✗ Error downloading file: {e}", Colors.RED, bold=True)
+        return json.loads(MANIFEST_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def is_safe_path(name):
+    """Check that an archive path is relative and has no '..' components."""
+    return not name.startswith("/") and ".." not in name.split("/")
+
+
+def is_safe_member(member):
+    """Check that a tar member, and the target of a link member, stay inside the extraction directory."""
+    if (member.issym() or member.islnk()) and not is_safe_path(member.linkname):
         return False
+    return is_safe_path(member.name)
 
 
-def extract_tarball(tarball_path, extract_to):
-    """Extract tar.gz file to specified directory."""
-    cprint(f"\n📦 Extracting {tarball_path.name}...", Colors.CYAN)
+def is_member_unchanged(member, manifest, extract_to):
+    """Check whether a file member looks untouched since the previous extract (same size and mtime)."""
+    if not member.isfile() or manifest.get(member.name) != [member.size, int(member.mtime)]:
+        return False
     try:
-        with tarfile.open(tarball_path, "r:gz") as tar:
-            tar.extractall(path=extract_to)
-        cprint("✓ Extraction complete!", Colors.GREEN, bold=True)
-        return True
-    except Exception as e:
-        cprint(f"✗ Error extracting file: {e}", Colors.RED, bold=True)
+        st = os.lstat(os.path.join(extract_to, member.name))
+    except OSError:
         return False
+    return (stat.S_ISREG(st.st_mode) and st.st_size == member.size
+            and int(st.st_mtime) == int(member.mtime))
+
+
+def rewrite_if_changed(tar, member, target):
+    """Compare a member's data with the file at target, rewriting it from the first difference; True if identical."""
+    source = tar.extractfile(member)
+    offset = 0
+    identical = True
+    with open(target, "r+b") as f:
+        while True:
+            chunk = source.read(DOWNLOAD_BUFFER_SIZE)
+            if not chunk:
+                break
+            if f.read(len(chunk)) != chunk:
+                # The stream can't be rewound, but everything before offset
+                # already matches, so overwrite from here on
+                f.seek(offset)
+                f.write(chunk)
+                shutil.copyfileobj(source, f, DOWNLOAD_BUFFER_SIZE)
+                f.truncate()
+                identical = False
+                break
+            offset += len(chunk)
+    # The mode can change between releases even when the data doesn't
+    os.chmod(target, member.mode)
+    if not identical:
+        os.utime(target, (member.mtime, member.mtime))
+    return identical
+
+
+def find_external_extractor(extract_to):
+    """Return the command line of a native tar extractor reading from stdin, if installed."""
+    if shutil.which("bsdtar"):
+        return ["bsdtar", "-xf", "-", "-C", str(extract_to)]
+    if shutil.which("tar") and shutil.which("pigz"):
+        return ["tar", "-I", "pigz", "-xf", "-", "-C", str(extract_to)]
+    return None
+
+
+def extract_with_command(command, stream):
+    """Pipe the archive stream into a native tar extractor."""
+    with subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL, bufsize=0) as proc:
+        try:
+            shutil.copyfileobj(stream, proc.stdin, DOWNLOAD_BUFFER_SIZE)
+        except BrokenPipeError:
+            pass  # The extractor exited early, its exit status says why
+        except BaseException:
+            proc.kill()
+            raise
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, command)
+    
+    # Every file was rewritten, so the previous manifest no longer applies
+    if MANIFEST_FILE.exists():
+        MANIFEST_FILE.unlink()
+
+
+def extract_with_tarfile(stream, extract_to):
+    """Extract the archive stream with tarfile, returning (files left untouched, Kiro binary path)."""
+    manifest = load_manifest()
+    new_manifest = {}
+    skipped = 0
+    binary_name = None
+    # python-isal inflates on a background thread with SIMD-accelerated
+    # inflate and CRC32, otherwise tarfile falls back to zlib
+    gz = igzip_threaded.open(stream, "rb") if igzip_threaded else None
+    try:
+        # Stream mode reads 10 KB at a time by default, match the download buffer
+        with tarfile.open(fileobj=gz or stream, mode="r|" if gz else "r|gz",
+                          bufsize=DOWNLOAD_BUFFER_SIZE) as tar:
+            for member in tar:
+                if not is_safe_member(member):
+                    continue
+                if member.isfile():
+                    new_manifest[member.name] = [member.size, int(member.mtime)]
+                    # Prefer the shallowest executable named 'kiro', the app
+                    # also ships a CLI helper of that name deeper in the tree
+                    if (os.path.basename(member.name) == "kiro" and member.mode & 0o111
+                            and (binary_name is None or member.name.count("/") < binary_name.count("/"))):
+                        binary_name = member.name
+                # Files identical to the previous release are still inflated
+                # but not written out again. Size and mtime only preselect
+                # them, the data itself is compared against the file on disk.
+                if is_member_unchanged(member, manifest, extract_to):
+                    if rewrite_if_changed(tar, member, os.path.join(extract_to, member.name)):
+                        skipped += 1
+                    continue
+                tar.extract(member, extract_to, **EXTRACT_OPTIONS)
+    finally:
+        if gz:
+            gz.close()
+    
+    try:
+        atomic_write(MANIFEST_FILE, json.dumps(new_manifest).encode())
+    except OSError:
+        pass  # Not critical, the next upgrade just rewrites every file
+    binary_path = Path(extract_to) / binary_name if binary_name else None
+    return skipped, binary_path
+
+
+def stream_download_and_extract(url, extract_to, expected_sha256=None):
+    """Download and extract the tarball on the fly, returning (success, Kiro binary path or None)."""
+    # The SHA-256 can only be checked once the whole stream has been read, by
+    # which point it has already been extracted over the existing install. A
+    # mismatch therefore can't protect the tree, it only stops the broken
+    # install from being recorded as good.
+    cprint(f"📥 Downloading from: {url}", Colors.BLUE)
+    cprint(f"📦 Extracting to: {extract_to}", Colors.BLUE)
+    command = find_external_extractor(extract_to)
+    skipped = 0
+    binary_path = None
+    
+    try:
+        raw, total_size = open_download(url)
+        # Cleared only once the extract has finished and the checksum matched,
+        # so a tree left half-overwritten is never taken for a good install
+        atomic_write(EXTRACT_PENDING_FILE, url.encode(), sync=True)
+        with raw:
+            reader = ProgressReader(raw, total_size)
+            buf = io.BufferedReader(reader, buffer_size=DOWNLOAD_BUFFER_SIZE)
+            # The archive is read sequentially, so network receive, gzip
+            # inflate and file write-out overlap
+            if command:
+                extract_with_command(command, buf)
+            else:
+                skipped, binary_path = extract_with_tarfile(buf, extract_to)
+            # tarfile stops at the end-of-archive marker, hash the rest too
+            while buf.read(DOWNLOAD_BUFFER_SIZE):
+                pass
+        print()  # New line after progress
+        
+        digest = reader.sha256.hexdigest()
+        if expected_sha256 and digest != expected_sha256.lower():
+            cprint("✗ Checksum mismatch, the download is corrupt", Colors.RED, bold=True)
+            cprint(f"  Expected: {expected_sha256}", Colors.RED)
+            cprint(f"  Got:      {digest}", Colors.RED)
+            cprint(f"  The existing install in {extract_to} was overwritten, run again to reinstall", Colors.YELLOW)
+            # Neither file describes the tree on disk any more
+            for stale_file in (MANIFEST_FILE, STATE_FILE):
+                if stale_file.exists():
+                    stale_file.unlink()
+            return False, None
+        
+        EXTRACT_PENDING_FILE.unlink()
+        cprint("✓ Download and extraction complete!", Colors.GREEN, bold=True)
+        if expected_sha256:
+            cprint("  SHA-256 checksum verified", Colors.GREEN)
+        if skipped:
+            cprint(f"  Kept {skipped} unchanged files from the previous install", Colors.CYAN)
+        return True, binary_path
+    except Exception as e:
+        cprint(f"\n✗ Error downloading or extracting file: {e}", Colors.RED, bold=True)
+        return False, None
 
 
 def find_kiro_binary(extract_dir):
-    """Find the Kiro binary in the extracted directory."""
+    """Find the Kiro binary at its usual locations in the extracted directory."""
     # Common locations for the binary
     possible_paths = [
         extract_dir / "kiro",
@@ -128,19 +652,30 @@ def find_kiro_binary(extract_dir):
         extract_dir / "Kiro" / "kiro",
     ]
     
-    # Search recursively if not found in common locations
     for path in possible_paths:
         if path.exists() and path.is_file():
             return path
     
-    # Fallback: search for any file named 'kiro'
-    for path in extract_dir.rglob("kiro"):
-        if path.is_file() and os.access(path, os.X_OK):
-            return path
-    
     return None
 
 
+def tree_size(root):
+    """Return the total size in bytes of all regular files under root."""
+    total = 0
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue  # e.g. a directory left root-owned by an earlier sudo run
+    return total
+
+
 def create_launcher_wrapper():
     """Create a launcher wrapper script that runs Kiro detached from terminal."""
     launcher_path = SCRIPT_DIR / "kiro-launcher.sh"
@@ -209,13 +744,17 @@ StartupWMClass=Kiro
         apps_dir = Path.home() / ".local" / "share" / "applications"
         apps_dir.mkdir(parents=True, exist_ok=True)
         
+        # Link rather than copy so both stay in sync across updates
         dest_desktop = apps_dir / "kiro.desktop"
-        dest_desktop.write_text(desktop_content)
+        if dest_desktop.exists() or dest_desktop.is_symlink():
+            dest_desktop.unlink()
+        dest_desktop.symlink_to(desktop_file)
         
-        # Update desktop database
+        # Update desktop database in the background, nothing here needs its result
         try:
-            subprocess.run(["update-desktop-database", str(apps_dir)], 
-                         check=False, capture_output=True)
+            subprocess.Popen(["update-desktop-database", str(apps_dir)],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                             start_new_session=True)
         except:
             pass  # Not critical if this fails
         
@@ -250,9 +789,10 @@ def create_symlink(launcher_path):
 
 def check_for_updates():
     """Check if there's a new version available."""
-    metadata = fetch_metadata()
-    latest_version, _ = find_tarball_url(metadata)
-    installed_version = get_installed_version()
+    latest_version, download_url, _, binary_sha256 = get_release_info()
+    migrate_legacy_version(latest_version, download_url)
+    state = load_install_state()
+    installed_version = state.get("version")
     
     cprint("\n" + "=" * 60, Colors.MAGENTA)
     cprint("📊 Version Check", Colors.MAGENTA, bold=True)
@@ -264,9 +804,15 @@ def check_for_updates():
     else:
         cprint(f"💻 Installed version: Not installed", Colors.YELLOW, bold=True)
     
-    if installed_version == latest_version:
+    if is_install_current(state, latest_version, download_url):
         cprint("\n✓ You have the latest version!", Colors.GREEN, bold=True)
         return False
+    elif find_current_binary(binary_sha256):
+        cprint("\n✓ The installed binary matches the latest version, run again to finish setup", Colors.GREEN, bold=True)
+        return False
+    elif installed_version == latest_version:
+        cprint("\n⚠ Installation is incomplete or damaged, run again to reinstall", Colors.YELLOW, bold=True)
+        return True
     elif installed_version:
         cprint(f"\n⚠ Update available: {installed_version} → {latest_version}", Colors.YELLOW, bold=True)
         return True
@@ -292,39 +838,41 @@ def main():
         return
     
     # Fetch and parse metadata
-    metadata = fetch_metadata()
-    latest_version, download_url = find_tarball_url(metadata)
-    installed_version = get_installed_version()
+    latest_version, download_url, tarball_sha256, binary_sha256 = get_release_info()
+    migrate_legacy_version(latest_version, download_url)
+    state = load_install_state()
+    installed_version = state.get("version")
     
     cprint(f"\n📦 Latest version: {latest_version}", Colors.CYAN, bold=True)
     if installed_version:
         cprint(f"💻 Installed version: {installed_version}", Colors.BLUE)
     
     # Check if already up to date
-    if installed_version == latest_version:
+    if is_install_current(state, latest_version, download_url):
         cprint(f"\n✓ You already have the latest version ({latest_version})!", Colors.GREEN, bold=True)
         cprint("  Use --check to check for updates", Colors.CYAN)
         return
     
-    # Determine filename and destination
-    filename = f"kiro-ide-{latest_version}-stable-linux-x64.tar.gz"
-    tarball_path = SCRIPT_DIR / filename
-    
-    # Download the file
-    cprint(f"\n{'─' * 60}", Colors.BLUE)
-    success = download_file(download_url, tarball_path)
-    
-    if not success:
-        sys.exit(1)
-    
-    # Extract the tarball
-    cprint(f"\n{'─' * 60}", Colors.BLUE)
-    if not extract_tarball(tarball_path, SCRIPT_DIR):
-        sys.exit(1)
-    
-    # Find the Kiro binary
-    cprint(f"\n🔍 Locating Kiro binary...", Colors.CYAN)
-    binary_path = find_kiro_binary(SCRIPT_DIR)
+    # The install record may be missing or stale while the extracted binary
+    # is already this release, one pass over it beats re-downloading
+    binary_path = find_current_binary(binary_sha256)
+    if binary_path:
+        cprint("\n✓ Installed binary already matches this release, skipping download", Colors.GREEN)
+    else:
+        if installed_version == latest_version:
+            cprint("⚠ Installation is incomplete or damaged, reinstalling", Colors.YELLOW)
+        
+        # Download and extract the tarball in one pass
+        cprint(f"\n{'─' * 60}", Colors.BLUE)
+        success, binary_path = stream_download_and_extract(download_url, SCRIPT_DIR, tarball_sha256)
+        if not success:
+            sys.exit(1)
+        
+        # Find the Kiro binary
+        cprint(f"\n🔍 Locating Kiro binary...", Colors.CYAN)
+        # Native extractors don't report member names, so check the usual locations
+        if not binary_path:
+            binary_path = find_kiro_binary(SCRIPT_DIR)
     
     if not binary_path:
         cprint("✗ Could not find Kiro binary in extracted files", Colors.RED, bold=True)
@@ -345,16 +893,11 @@ def main():
         else:
             cprint("⚠ Warning: Could not create launcher wrapper, skipping symlink", Colors.YELLOW)
     
-    # Save installed version
-    save_installed_version(latest_version)
-    
-    # Clean up tarball
-    cprint(f"\n🧹 Cleaning up tarball...", Colors.CYAN)
-    tarball_path.unlink()
-    cprint("✓ Tarball removed", Colors.GREEN)
+    # Save install state
+    save_install_state(latest_version, download_url, binary_path)
     
     # Success summary
-    file_size = sum(f.stat().st_size for f in SCRIPT_DIR.rglob("*") if f.is_file()) / (1024 * 1024)
+    file_size = tree_size(SCRIPT_DIR) / (1024 * 1024)
     cprint(f"\n{'=' * 60}", Colors.GREEN, bold=True)
     cprint(f"✓ Successfully installed Kiro v{latest_version}", Colors.GREEN, bold=True)
     cprint(f"  Location: {SCRIPT_DIR}", Colors.GREEN)